@@ -2,6 +2,8 @@
 import psutil
 import numpy as np
 
+psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU counter
+
 def get_system_features():
     """Capture 10 key features for ML model"""
     features = []
@@ -18,7 +20,7 @@ def get_system_features():
     
     # System features (5 metrics)
     features.extend([
-        psutil.cpu_percent(interval=1),
+        psutil.cpu_percent(interval=None),
         psutil.virtual_memory().percent,
         len(psutil.net_connections()),
         len([f for f in psutil.disk_io_counters(perdisk=False)]),
@@ -6,6 +6,10 @@ import logging
 import shutil
 import socket
 import smtplib
+import queue
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
 from datetime import datetime, timedelta
 from watchdog.observers import Observer
@@ -13,11 +17,22 @@ from watchdog.events import FileSystemEventHandler
 import joblib
 import numpy as np
 from sklearn.ensemble import IsolationForest
+from entropy_kernels import shannon_entropy
+
+# Magic numbers of common formats that are not treated as encrypted
+KNOWN_HEADERS = (b'\x89PNG', b'\xFF\xD8', b'%PDF', b'PK\x03\x04', b'GIF8')
+
+# Extensions commonly appended by ransomware to encrypted files
+SUSPICIOUS_EXTS = frozenset({'.encrypted', '.locked', '.crypt', '.ransom'})
 
 class AdvancedRansomwareDefender(FileSystemEventHandler):
+    SAMPLE_INTERVAL = 1.0  # Seconds between background system feature samples
+
     def __init__(self, watch_path, config_path='defender_config.ini'):
         # Configuration
         self.watch_path = os.path.abspath(watch_path)
+        self._watch_path_lower = self.watch_path.lower()
+        self._hostname = socket.gethostname()
         self.config = self._load_config(config_path)
         
         # Detection parameters
@@ -34,12 +49,24 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         self._load_ml_model()
         
         # System state tracking
-        self.file_operations = []
+        psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU counter
+        self._proc_lock = threading.Lock()
+        self._proc_cache = {}  # pid -> psutil.Process, primed for cpu_percent
+        self._refresh_proc_cache()
+        self._last_feat = 0.0
+        self._last_feat_cache = None
+        self.file_operations = deque()  # time.monotonic() of recent modifications
+        self._state_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._entropy_cache = OrderedDict()  # path -> ((mtime_ns, size), entropy, is_suspicious)
+        self._entropy_cache_size = 4096
         self.system_baseline = self._establish_baseline()
         
         # Initialize systems
         self._setup_logging()
         self._setup_notifications()
+        self._start_workers()
+        self._start_sampler()
         print(f"[System] Monitoring initialized for {self.watch_path}")
 
     def _load_config(self, config_path):
@@ -59,9 +86,18 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         """Load trained ML model for anomaly detection"""
         try:
             self.model = joblib.load('models/ransomware_model_latest.pkl')
-            self.scaler = joblib.load('models/scaler_latest.pkl')
             if not isinstance(self.model, IsolationForest):
                 raise ValueError("Invalid model type")
+            
+            if getattr(self.model, 'scaler_folded_', False):
+                # Thresholds already work on raw features, no scaling needed
+                self._mean = self._inv_scale = None
+            else:
+                # Cache scaler parameters so events skip sklearn's input validation
+                self.scaler = joblib.load('models/scaler_latest.pkl')
+                self._mean = self.scaler.mean_.astype(np.float32)
+                self._inv_scale = (1.0 / self.scaler.scale_).astype(np.float32)
+            self.model.n_jobs = 1  # Single-row predicts gain nothing from parallelism
         except Exception as e:
             print(f"[Warning] ML model not loaded: {str(e)}")
             self.model = None
@@ -69,21 +105,36 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
     def _establish_baseline(self):
         """Establish normal system behavior baseline"""
         print("[System] Establishing behavior baseline...")
-        samples = []
+        self._bl_n = 0
+        self._bl_mean = np.zeros(6)
+        self._bl_M2 = np.zeros(6)
         for _ in range(30):  # 30 samples over 30 seconds
             features = self._get_system_features()
             if features is not None:
-                samples.append(features)
+                self._update_baseline(features)
             time.sleep(1)
         
-        if len(samples) < 20:
+        return self._baseline_stats()
+
+    def _update_baseline(self, features):
+        """Fold one feature sample into the running baseline (Welford)"""
+        x = np.asarray(features, dtype=np.float64)
+        self._bl_n += 1
+        delta = x - self._bl_mean
+        self._bl_mean += delta / self._bl_n
+        self._bl_M2 += delta * (x - self._bl_mean)
+
+    def _baseline_stats(self):
+        """Summarise the running baseline, None until enough samples exist"""
+        if self._bl_n < 20:
             return None
             
+        stds = np.sqrt(self._bl_M2 / self._bl_n)
         return {
-            'cpu_mean': np.mean([s[0] for s in samples]),
-            'cpu_std': np.std([s[0] for s in samples]),
-            'mem_mean': np.mean([s[1] for s in samples]),
-            'mem_std': np.std([s[1] for s in samples])
+            'cpu_mean': self._bl_mean[0],
+            'cpu_std': stds[0],
+            'mem_mean': self._bl_mean[1],
+            'mem_std': stds[1]
         }
 
     def _setup_logging(self):
@@ -104,69 +155,143 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         self.notification_queue = []
         self.admin_email = self.config.get('notifications', 'admin_email', fallback=None)
 
+    def _start_workers(self, num_workers=4):
+        """Start worker threads that analyse queued file events"""
+        self._work_q = queue.Queue(maxsize=10000)
+        self._workers = []
+        for i in range(num_workers):
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"DefenderWorker-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker_loop(self):
+        """Process queued file paths off the watchdog dispatch thread"""
+        while True:
+            filepath, event_time = self._work_q.get()
+            try:
+                self._process_path(filepath, event_time)
+            except Exception as e:
+                self.logger.error(f"Failed to process {filepath}: {str(e)}")
+            finally:
+                self._work_q.task_done()
+
+    def _start_sampler(self):
+        """Start the background thread that refreshes system features"""
+        self._stop_event = threading.Event()
+        self._latest_features = self._get_system_features()
+        self._sampler = threading.Thread(
+            target=self._sampler_loop, name="DefenderSampler", daemon=True
+        )
+        self._sampler.start()
+
+    def _sampler_loop(self):
+        """Sample system features at a fixed rate, independent of file events"""
+        while not self._stop_event.wait(self.SAMPLE_INTERVAL):
+            features = self._get_system_features()
+            self._latest_features = features
+            if features is not None:
+                # Keep refining the baseline with constant memory
+                self._update_baseline(features)
+                self.system_baseline = self._baseline_stats()
+
+    def stop(self):
+        """Stop background sampling"""
+        self._stop_event.set()
+
     def _get_system_features(self):
         """Collect current system metrics"""
+        now = time.monotonic()
+        if self._last_feat_cache is not None and now - self._last_feat < 0.25:
+            return self._last_feat_cache
+            
         try:
-            return [
-                psutil.cpu_percent(interval=1),
+            net = psutil.net_io_counters()
+            pids = psutil.pids()
+            self._refresh_proc_cache(pids)  # Prime new processes ahead of a sweep
+            self._last_feat_cache = [
+                psutil.cpu_percent(interval=None),
                 psutil.virtual_memory().percent,
-                len(psutil.pids()),
+                len(pids),
                 psutil.disk_usage('/').percent,
-                psutil.net_io_counters().bytes_sent,
-                psutil.net_io_counters().bytes_recv
+                net.bytes_sent,
+                net.bytes_recv
             ]
+            self._last_feat = now
+            return self._last_feat_cache
         except Exception as e:
             self.logger.error(f"Failed to collect system features: {str(e)}")
             return None
 
     def _calculate_entropy(self, data):
         """Calculate Shannon entropy of data"""
-        if not data:
-            return 0
-            
-        entropy = 0
-        for x in range(256):
-            p_x = data.count(x)/len(data)
-            if p_x > 0:
-                entropy += -p_x * (p_x.bit_length() - 1)
-        return entropy
-
-    def _detect_encryption(self, filepath):
+        return shannon_entropy(data)
+
+    def _detect_encryption(self, filepath, st=None):
         """Check if file shows signs of encryption"""
         try:
-            with open(filepath, 'rb') as f:
-                data = f.read(8192)  # Read first 8KB for analysis
+            if st is None:
+                st = os.stat(filepath)
+            stamp = (st.st_mtime_ns, st.st_size)
+            with self._cache_lock:
+                cached = self._entropy_cache.get(filepath)
+                if cached is not None and cached[0] == stamp:
+                    self._entropy_cache.move_to_end(filepath)
+                    return cached[2]
                 
-                # Check entropy
-                entropy = self._calculate_entropy(data)
-                if entropy > 7.0:  # High entropy suggests encryption
-                    return True
-                    
-                # Check file headers (simple version)
-                if not data.startswith(b'\x89PNG') and not data.startswith(b'\xFF\xD8') and not data.startswith(b'%PDF'):
-                    return True
+            fd = os.open(filepath, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            try:
+                # Probe the file header first, only read 8KB for unknown types
+                data = os.read(fd, 16)
+                if data.startswith(KNOWN_HEADERS):
+                    entropy, suspicious = None, False
+                else:
+                    data += os.read(fd, 8192 - len(data))
+                    entropy = self._calculate_entropy(data)
+                    suspicious = entropy > 7.0  # High entropy suggests encryption
+            finally:
+                os.close(fd)
+                
+            with self._cache_lock:
+                self._entropy_cache[filepath] = (stamp, entropy, suspicious)
+                self._entropy_cache.move_to_end(filepath)
+                if len(self._entropy_cache) > self._entropy_cache_size:
+                    self._entropy_cache.popitem(last=False)
+            return suspicious
                     
         except Exception as e:
             self.logger.warning(f"Could not analyze {filepath}: {str(e)}")
             
         return False
 
+    def _invalidate_entropy_cache(self, filepath):
+        """Drop cached analysis results for a file"""
+        with self._cache_lock:
+            self._entropy_cache.pop(filepath, None)
+
     def _check_suspicious_activity(self, filepath):
         """Evaluate multiple detection indicators"""
+        with self._state_lock:
+            mass_modification = len(self.file_operations) > 15 and \
+                (time.monotonic() - self.file_operations[0]) < 10
+        # rpartition, unlike splitext, also catches dot-only names like '.locked'
+        _, dot, suffix = os.path.basename(filepath).rpartition('.')
         indicators = {
-            'suspicious_extension': filepath.lower().endswith(('.encrypted', '.locked', '.crypt', '.ransom')),
+            'suspicious_extension': (dot + suffix).lower() in SUSPICIOUS_EXTS,
             'high_entropy': self._detect_encryption(filepath),
-            'mass_modification': len(self.file_operations) > 15 and 
-                               (datetime.now() - self.file_operations[0]).seconds < 10,
+            'mass_modification': mass_modification,
             'ml_anomaly': False
         }
         
         # Check ML model if available
         if self.model:
-            features = self._get_system_features()
+            features = self._latest_features
             if features:
-                scaled = self.scaler.transform([features])
-                indicators['ml_anomaly'] = self.model.predict(scaled)[0] == -1
+                sample = np.asarray(features, np.float32)
+                if self._mean is not None:
+                    sample = (sample - self._mean) * self._inv_scale
+                indicators['ml_anomaly'] = self.model.predict(sample[None, :])[0] == -1
         
         return indicators
 
@@ -175,34 +300,51 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         if event.is_directory or not event.src_path.startswith(self.watch_path):
             return
             
-        filepath = event.src_path
-        self.file_operations.append(datetime.now())
-        
-        # Keep only recent operations (last minute)
-        self.file_operations = [op for op in self.file_operations 
-                              if datetime.now() - op < timedelta(minutes=1)]
+        # Hand the path to the worker pool so the watchdog thread never blocks
+        try:
+            self._work_q.put_nowait((event.src_path, time.monotonic()))
+        except queue.Full:
+            self.logger.warning(f"Event queue full, dropped {event.src_path}")
+
+    def _process_path(self, filepath, event_time):
+        """Analyse a modified file and react to suspicious activity"""
+        self._invalidate_entropy_cache(filepath)
+        with self._state_lock:
+            # Record when the event arrived, not when a worker got to it
+            self.file_operations.append(event_time)
+            
+            # Keep only recent operations (last minute)
+            cutoff = time.monotonic() - 60.0
+            while self.file_operations and self.file_operations[0] < cutoff:
+                self.file_operations.popleft()
         
         # Check for suspicious activity
         indicators = self._check_suspicious_activity(filepath)
         if any(indicators.values()):
             score_increase = sum(2 if v else 0 for v in indicators.values())
-            self.suspicion_score = min(self.suspicion_score + score_increase, 20)
+            activate = False
+            with self._state_lock:
+                self.suspicion_score = min(self.suspicion_score + score_increase, 20)
+                score = self.suspicion_score
+                
+                # Check if we need to take action
+                current_time = datetime.now()
+                if (self.suspicion_score >= self.alert_threshold and 
+                    (self.last_alert is None or 
+                     (current_time - self.last_alert) > self.cooldown_period)):
+                    
+                    activate = True
+                    self.last_alert = current_time
+                    self.suspicion_score = self.alert_threshold // 2  # Reduce but not reset
             
             self.logger.warning(
                 f"Suspicious activity detected on {os.path.basename(filepath)}. "
                 f"Indicators: {[k for k,v in indicators.items() if v]}. "
-                f"Score: {self.suspicion_score}/{self.alert_threshold}"
+                f"Score: {score}/{self.alert_threshold}"
             )
             
-            # Check if we need to take action
-            current_time = datetime.now()
-            if (self.suspicion_score >= self.alert_threshold and 
-                (self.last_alert is None or 
-                 (current_time - self.last_alert) > self.cooldown_period)):
-                
+            if activate:
                 self._take_defensive_actions()
-                self.last_alert = current_time
-                self.suspicion_score = self.alert_threshold // 2  # Reduce but not reset
 
     def _take_defensive_actions(self):
         """Execute comprehensive defense strategy"""
@@ -227,19 +369,52 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         
         self.logger.critical(f"Defensive actions taken: {actions}")
 
+    def _refresh_proc_cache(self, pids=None):
+        """Sync cached process handles with the currently running pids"""
+        pids = set(psutil.pids() if pids is None else pids)
+        with self._proc_lock:
+            for pid, proc in list(self._proc_cache.items()):
+                # is_running() is False once the pid has been reused
+                if pid not in pids or not proc.is_running():
+                    del self._proc_cache[pid]
+            for pid in pids - set(self._proc_cache):
+                try:
+                    proc = psutil.Process(pid)
+                except psutil.Error:
+                    continue
+                try:
+                    proc.cpu_percent(interval=None)  # Prime on first sight
+                except psutil.AccessDenied:
+                    pass
+                except psutil.NoSuchProcess:
+                    continue
+                self._proc_cache[pid] = proc
+
     def _terminate_suspicious_processes(self):
         """Kill processes with suspicious behavior"""
         terminated = []
-        for proc in psutil.process_iter(['pid', 'name', 'exe', 'cpu_percent', 'memory_percent']):
+        self._refresh_proc_cache()
+        with self._proc_lock:
+            procs = list(self._proc_cache.values())
+        for proc in procs:
             try:
-                info = proc.info
-                if (info['cpu_percent'] > 70 or info['memory_percent'] > 30) and \
-                   'system' not in info['name'].lower() and \
-                   info['exe'] and self.watch_path.lower() in info['exe'].lower():
+                with proc.oneshot():
+                    cpu = proc.cpu_percent(interval=None)
+                    mem = proc.memory_percent()
+                    name = proc.name()
+                    exe = proc.exe()
+                if (cpu > 70 or mem > 30) and \
+                   'system' not in name.lower() and \
+                   exe and self._watch_path_lower in exe.lower():
                     
-                    psutil.Process(info['pid']).kill()
-                    terminated.append(info['name'])
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    proc.kill()
+                    terminated.append(name)
+            except psutil.NoSuchProcess:
+                # Gone or pid reused, drop the stale handle
+                with self._proc_lock:
+                    if self._proc_cache.get(proc.pid) is proc:
+                        del self._proc_cache[proc.pid]
+            except psutil.AccessDenied:
                 continue
                 
         return f"Terminated {len(terminated)} processes"
@@ -249,20 +424,37 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         quarantine_dir = os.path.join(self.watch_path, "QUARANTINE")
         os.makedirs(quarantine_dir, exist_ok=True)
         
-        quarantined = 0
-        for item in os.listdir(self.watch_path):
-            item_path = os.path.join(self.watch_path, item)
-            if os.path.isfile(item_path) and self._detect_encryption(item_path):
+        entries, stats = [], []
+        with os.scandir(self.watch_path) as it:
+            for entry in it:
                 try:
-                    target = os.path.join(
-                        quarantine_dir,
-                        f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{item}"
-                    )
-                    shutil.move(item_path, target)
-                    quarantined += 1
-                except Exception as e:
-                    self.logger.error(f"Failed to quarantine {item}: {str(e)}")
-                    
+                    if entry.is_file(follow_symlinks=False):
+                        stats.append(entry.stat(follow_symlinks=False))
+                        entries.append(entry)
+                except OSError:
+                    continue
+        
+        # Analyse files concurrently so the header reads overlap
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            flags = list(pool.map(
+                self._detect_encryption, [entry.path for entry in entries], stats
+            ))
+        
+        quarantined = 0
+        for entry, suspicious in zip(entries, flags):
+            if not suspicious:
+                continue
+            item = entry.name
+            try:
+                target = os.path.join(
+                    quarantine_dir,
+                    f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{item}"
+                )
+                shutil.move(entry.path, target)
+                quarantined += 1
+            except Exception as e:
+                self.logger.error(f"Failed to quarantine {item}: {str(e)}")
+                
         return f"Quarantined {quarantined} files"
 
     def _isolate_network(self):
@@ -294,7 +486,7 @@ class AdvancedRansomwareDefender(FileSystemEventHandler):
         try:
             msg = EmailMessage()
             msg.set_content(
-                f"Ransomware attack detected on {socket.gethostname()}!\n"
+                f"Ransomware attack detected on {self._hostname}!\n"
                 f"Path: {self.watch_path}\n"
                 f"Time: {datetime.now()}\n"
                 f"Please investigate immediately!"
@@ -330,6 +522,7 @@ def start_monitoring(path_to_watch):
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
+        event_handler.stop()
         print("\nMonitoring stopped by user")
     observer.join()
 
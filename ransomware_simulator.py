@@ -6,11 +6,13 @@ import pandas as pd
 import psutil
 from datetime import datetime, timedelta
 
+psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU counter
+
 def get_system_features():
     """Collect system metrics for training data"""
     try:
         return np.array([
-            psutil.cpu_percent(interval=1),
+            psutil.cpu_percent(interval=None),
             psutil.virtual_memory().percent,
             len(psutil.pids()),
             psutil.disk_usage('/').percent,
@@ -21,6 +23,11 @@ def get_system_features():
         print(f"Error collecting features: {e}")
         return None
 
+def random_chunk(pool, size):
+    """Return a random window of `size` bytes from a pre-generated pool"""
+    start = random.randint(0, len(pool) - size)
+    return pool[start:start + size]
+
 def encrypt_files(target_path, num_files=10):
     """Simulate ransomware file encryption"""
     extensions = ['.docx', '.xlsx', '.pdf', '.jpg', '.png', '.txt']
@@ -45,13 +52,16 @@ def encrypt_files(target_path, num_files=10):
 def generate_training_data(target_path, output_file='data/training_data.csv'):
     """Generate training data by simulating normal and attack behavior"""
     os.makedirs('data', exist_ok=True)
-    features = []
+    samples = np.empty((200, 7), dtype=np.float64)  # 6 features + label
+    idx = 0
     
     print("Collecting normal behavior samples...")
     for i in range(100):  # Normal behavior
         feat = get_system_features()
         if feat is not None:
-            features.append(np.append(feat, 0))  # Label 0 for normal
+            samples[idx, :6] = feat
+            samples[idx, 6] = 0  # Label 0 for normal
+            idx += 1
         time.sleep(0.5)
         print(f"Collected {i+1}/100 normal samples", end='\r')
     
@@ -62,19 +72,22 @@ def generate_training_data(target_path, output_file='data/training_data.csv'):
     for i in range(100):  # Attack behavior
         feat = get_system_features()
         if feat is not None:
-            features.append(np.append(feat, 1))  # Label 1 for attack
+            samples[idx, :6] = feat
+            samples[idx, 6] = 1  # Label 1 for attack
+            idx += 1
         time.sleep(0.5)
         print(f"Collected {i+1}/100 attack samples", end='\r')
     
     # Save to CSV
     columns = ['cpu', 'memory', 'processes', 'disk', 'net_out', 'net_in', 'label']
-    pd.DataFrame(features, columns=columns).to_csv(output_file, index=False)
+    pd.DataFrame(samples[:idx], columns=columns).to_csv(output_file, index=False)
     print(f"\nTraining data saved to {output_file}")
 
 def run_simulation(target_path, duration=300):
     """Run the ransomware simulation"""
     extensions = ['.docx', '.xlsx', '.pdf', '.jpg', '.png', '.txt']
     end_time = datetime.now() + timedelta(seconds=duration)
+    pool = os.urandom(10 * 1024 * 1024)  # Slice file contents from one random pool
     
     print(f"Starting simulation in {target_path} for {duration} seconds")
     
@@ -86,12 +99,12 @@ def run_simulation(target_path, duration=300):
             
             if action == 'create':
                 with open(filepath, 'wb') as f:
-                    f.write(os.urandom(random.randint(1024, 10240)))
+                    f.write(random_chunk(pool, random.randint(1024, 10240)))
                 print(f"Created {filename}")
             
             elif action == 'modify' and os.path.exists(filepath):
                 with open(filepath, 'ab') as f:
-                    f.write(os.urandom(random.randint(512, 5120)))
+                    f.write(random_chunk(pool, random.randint(512, 5120)))
                 print(f"Modified {filename}")
             
             elif action == 'encrypt' and os.path.exists(filepath):
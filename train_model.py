@@ -42,8 +42,7 @@ class RansomwareModelTrainer:
             
         # Scale features
         scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+        X_train_scaled = scaler.fit_transform(X_train).astype(np.float32, copy=False)
         
         # Train Isolation Forest
         model = IsolationForest(
@@ -55,9 +54,10 @@ class RansomwareModelTrainer:
             verbose=1
         )
         model.fit(X_train_scaled)
+        self.fold_scaler(model, scaler)
         
-        # Evaluate
-        y_pred = model.predict(X_test_scaled)
+        # Evaluate on raw features, the scaler now lives in the thresholds
+        y_pred = model.predict(np.asarray(X_test, dtype=np.float32))
         y_pred = [1 if x == -1 else 0 for x in y_pred]  # Convert to binary labels
         
         print("\nModel Evaluation:")
@@ -65,6 +65,22 @@ class RansomwareModelTrainer:
         
         return model, scaler
     
+    @staticmethod
+    def fold_scaler(model, scaler):
+        """Rewrite tree thresholds so the model accepts unscaled features"""
+        n_features = len(scaler.mean_)
+        for est, est_features in zip(model.estimators_, model.estimators_features_):
+            tree = est.tree_
+            split = tree.feature >= 0  # Leaves have feature == -2
+            feature = tree.feature[split]
+            if len(est_features) != n_features:
+                feature = est_features[feature]  # Tree was fit on a feature subset
+            # tree_.threshold is a writable view on the tree's node array
+            tree.threshold[split] = (
+                tree.threshold[split] * scaler.scale_[feature] + scaler.mean_[feature]
+            )
+        model.scaler_folded_ = True
+    
     def save_model(self, model, scaler):
         """Save model artifacts with versioning"""
         os.makedirs('models', exist_ok=True)